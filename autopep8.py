@@ -69,6 +69,7 @@ import collections
 import copy
 import difflib
 import fnmatch
+import functools
 import importlib
 import inspect
 import io
@@ -114,6 +115,16 @@ COMPARE_TYPE_REGEX = re.compile(
     r'|\btype(?:\s*\(\s*([^)]*[^ )])\s*\))\s+([=!]=)'
 )
 TYPE_REGEX = re.compile(r'(type\s*\(\s*[^)]*?[^\s)]\s*\))')
+TYPE_COMPARE_SUFFIX_REGEX = re.compile(r"^\s*([^\s:]+)(.*)$")
+LEADING_WHITESPACE_REGEX = re.compile(r'^\s+')
+UNARY_OPERATOR_AFTER_BRACKET_REGEX = re.compile(r'[(\[{]\s*[\-\+~]$')
+LAMBDA_STAR_END_REGEX = re.compile(r'lambda\s*\*$')
+NEGATED_BOOLEAN_IF_REGEX = re.compile(
+    r'^(\s*)if ([\w."\'\[\]]+) (?:== False|!= True):$')
+LEADING_TRUE_REGEX = re.compile(r'\bTrue\b *')
+LEADING_FALSE_REGEX = re.compile(r'\bFalse\b *')
+IMPORT_KEYWORD_REGEX = re.compile(r'\bimport\b')
+COMMENT_WITH_TEXT_REGEX = re.compile(r'\s*#+\s*\w+')
 
 EXIT_CODE_OK = 0
 EXIT_CODE_ERROR = 1
@@ -976,8 +987,7 @@ class FixPEP8(object):
         if not target.lstrip().startswith('import'):
             return []
 
-        indentation = re.split(pattern=r'\bimport\b',
-                               string=target, maxsplit=1)[0]
+        indentation = IMPORT_KEYWORD_REGEX.split(target, maxsplit=1)[0]
         fixed = (target[:offset].rstrip('\t ,') + '\n' +
                  indentation + 'import ' + target[offset:].lstrip('\t ,'))
         self.source[line_index] = fixed
@@ -1196,12 +1206,9 @@ class FixPEP8(object):
                                                                  self.source)
 
         # Handle very easy "not" special cases.
-        if re.match(r'^\s*if [\w."\'\[\]]+ == False:$', target):
-            self.source[line_index] = re.sub(r'if ([\w."\'\[\]]+) == False:',
-                                             r'if not \1:', target, count=1)
-        elif re.match(r'^\s*if [\w."\'\[\]]+ != True:$', target):
-            self.source[line_index] = re.sub(r'if ([\w."\'\[\]]+) != True:',
-                                             r'if not \1:', target, count=1)
+        if NEGATED_BOOLEAN_IF_REGEX.match(target):
+            self.source[line_index] = NEGATED_BOOLEAN_IF_REGEX.sub(
+                r'\1if not \2:', target, count=1)
         else:
             right_offset = offset + 2
             if right_offset >= len(target):
@@ -1212,17 +1219,16 @@ class FixPEP8(object):
             right = target[right_offset:].lstrip()
 
             # Handle simple cases only.
-            new_right = None
+            match = None
             if center.strip() == '==':
-                if re.match(r'\bTrue\b', right):
-                    new_right = re.sub(r'\bTrue\b *', '', right, count=1)
+                match = LEADING_TRUE_REGEX.match(right)
             elif center.strip() == '!=':
-                if re.match(r'\bFalse\b', right):
-                    new_right = re.sub(r'\bFalse\b *', '', right, count=1)
+                match = LEADING_FALSE_REGEX.match(right)
 
-            if new_right is None:
+            if match is None:
                 return []
 
+            new_right = right[match.end():]
             if new_right[0].isalnum():
                 new_right = ' ' + new_right
 
@@ -1321,7 +1327,7 @@ class FixPEP8(object):
                 isinstance_stmt = " not isinstance"
 
             _type_comp = f"{_target_obj}, {target[:start]}"
-            indent_match = re.match(r'^\s+', target)
+            indent_match = LEADING_WHITESPACE_REGEX.match(target)
             indent = ""
             if indent_match:
                 indent = indent_match.group()
@@ -1344,10 +1350,8 @@ class FixPEP8(object):
                 cmp_b = _suffix_type_match.groups()[0]
                 _type_comp = f"{_target_obj}, {cmp_b}"
             else:
-                _else_suffix_match = re.match(
-                    r"^\s*([^\s:]+)(.*)$",
-                    _suffix_tmp,
-                )
+                _else_suffix_match = TYPE_COMPARE_SUFFIX_REGEX.match(
+                    _suffix_tmp)
                 if _else_suffix_match:
                     _else_suffix = _else_suffix_match.group(1)
                     _else_suffix_other = _else_suffix_match.group(2)
@@ -3002,44 +3006,64 @@ def fix_whitespace(line, offset, replacement):
     return left + replacement + right
 
 
-def _execute_pep8(pep8_options, source):
-    """Execute pycodestyle via python method calls."""
-    class QuietReport(pycodestyle.BaseReport):
+class QuietReport(pycodestyle.BaseReport):
 
-        """Version of checker that does not print."""
+    """Version of checker that does not print."""
 
-        def __init__(self, options):
-            super(QuietReport, self).__init__(options)
-            self.__full_error_results = []
+    def __init__(self, options):
+        super(QuietReport, self).__init__(options)
+        self.__full_error_results = []
 
-        def error(self, line_number, offset, text, check):
-            """Collect errors."""
-            code = super(QuietReport, self).error(line_number,
-                                                  offset,
-                                                  text,
-                                                  check)
-            if code:
-                self.__full_error_results.append(
-                    {'id': code,
-                     'line': line_number,
-                     'column': offset + 1,
-                     'info': text})
+    def error(self, line_number, offset, text, check):
+        """Collect errors."""
+        code = super(QuietReport, self).error(line_number,
+                                              offset,
+                                              text,
+                                              check)
+        if code:
+            self.__full_error_results.append(
+                {'id': code,
+                 'line': line_number,
+                 'column': offset + 1,
+                 'info': text})
+
+    def full_error_results(self):
+        """Return error results in detail.
 
-        def full_error_results(self):
-            """Return error results in detail.
+        Results are in the form of a list of dictionaries. Each
+        dictionary contains 'id', 'line', 'column', and 'info'.
 
-            Results are in the form of a list of dictionaries. Each
-            dictionary contains 'id', 'line', 'column', and 'info'.
+        """
+        return self.__full_error_results
 
-            """
-            return self.__full_error_results
 
-    checker = pycodestyle.Checker('', lines=source, reporter=QuietReport,
-                                  **pep8_options)
+def _execute_pep8(pep8_options, source):
+    """Execute pycodestyle via python method calls."""
+    key = []
+    for name, value in sorted(pep8_options.items()):
+        if isinstance(value, (list, set)):
+            value = tuple(sorted(value))
+        key.append((name, value))
+    style_options = _get_pycodestyle_options(tuple(key))
+    checker = pycodestyle.Checker('', lines=source, options=style_options,
+                                  report=QuietReport(style_options))
     checker.check_all()
     return checker.report.full_error_results()
 
 
+@functools.lru_cache(maxsize=16)
+def _get_pycodestyle_options(pep8_options):
+    """Return pycodestyle options built from (name, value) pairs.
+
+    Building a StyleGuide parses options and collects the registered
+    checks, so it is done once per distinct set of options rather than on
+    every pass over the source.
+
+    """
+    return pycodestyle.StyleGuide(dict(pep8_options),
+                                  reporter=QuietReport).options
+
+
 def _remove_leading_and_normalize(line, with_rstrip=True):
     # ignore FF in first lstrip()
     if with_rstrip:
@@ -3287,7 +3311,7 @@ def get_disabled_ranges(source):
     """
     enable_line_nums = find_with_line_numbers(ENABLE_REGEX, source)
     disable_line_nums = find_with_line_numbers(DISABLE_REGEX, source)
-    total_lines = len(re.findall("\n", source)) + 1
+    total_lines = source.count('\n') + 1
 
     enable_commands = {}
     for num in enable_line_nums:
@@ -3424,7 +3448,7 @@ def multiline_string_lines(source, include_docstrings=False):
                 ):
                     # We increment by one since we want the contents of the
                     # string.
-                    line_numbers |= set(range(1 + start_row, 1 + end_row))
+                    line_numbers.update(range(1 + start_row, 1 + end_row))
 
             previous_token_type = token_type
     except (SyntaxError, tokenize.TokenError):
@@ -3495,7 +3519,7 @@ def shorten_comment(line, max_line_length, last_comment=False):
     ):
         # Trim comments that end with things like ---------
         return line[:max_line_length] + '\n'
-    elif last_comment and re.match(r'\s*#+\s*\w+', line):
+    elif last_comment and COMMENT_WITH_TEXT_REGEX.match(line):
         split_lines = textwrap.wrap(line.lstrip(' \t#'),
                                     initial_indent=indentation,
                                     subsequent_indent=indentation,
@@ -3679,6 +3703,13 @@ def fix_file(filename, options=None, output=None, apply_config=False):
 
 def global_fixes():
     """Yield multiple (code, function) tuples."""
+    yield from _get_global_fixes()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_global_fixes():
+    """Return (code, function) tuples; fixes do not change after import."""
+    fixes = []
     for function in list(globals().values()):
         if inspect.isfunction(function):
             arguments = _get_parameters(function)
@@ -3687,7 +3718,8 @@ def global_fixes():
 
             code = extract_code_from_function(function)
             if code:
-                yield (code, function)
+                fixes.append((code, function))
+    return tuple(fixes)
 
 
 def _get_parameters(function):
@@ -4305,10 +4337,11 @@ def line_shortening_rank(candidate, indent_word, max_line_length,
                 rank += 100
 
         # Avoid breaking at unary operators.
-        if re.match(r'.*[(\[{]\s*[\-\+~]$', current_line.rstrip('\\ ')):
+        if UNARY_OPERATOR_AFTER_BRACKET_REGEX.search(
+                current_line.rstrip('\\ ')):
             rank += 1000
 
-        if re.match(r'.*lambda\s*\*$', current_line.rstrip('\\ ')):
+        if LAMBDA_STAR_END_REGEX.search(current_line.rstrip('\\ ')):
             rank += 1000
 
         if current_line.endswith(('%', '(', '[', '{')):
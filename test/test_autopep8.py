@@ -7,13 +7,14 @@ Unit tests go in "UnitTests". System tests go in "SystemTests".
 import os
 import re
 import sys
-import time
 import contextlib
+import copy
+import functools
 import io
 import shutil
 import stat
 from subprocess import Popen, PIPE
-from tempfile import mkstemp, mkdtemp
+from tempfile import mkstemp, mkdtemp, TemporaryDirectory
 import tokenize
 import unittest
 import warnings
@@ -26,22 +27,25 @@ sys.path.insert(0, ROOT_DIR)
 import autopep8     # NOQA: E402
 from autopep8 import get_module_imports_on_top_of_file  # NOQA: E402
 
-FAKE_CONFIGURATION = os.path.join(ROOT_DIR, 'test', 'fake_configuration')
+AUTOPEP8_PATH = os.path.join(ROOT_DIR, 'autopep8.py')
+TEST_DIR = os.path.join(ROOT_DIR, 'test')
+FAKE_CONFIGURATION = os.path.join(TEST_DIR, 'fake_configuration')
 FAKE_PYCODESTYLE_CONFIGURATION = os.path.join(
-    ROOT_DIR, 'test', 'fake_pycodestyle_configuration'
+    TEST_DIR, 'fake_pycodestyle_configuration'
 )
+EXAMPLE_PATH = os.path.join(TEST_DIR, 'example.py')
+E101_EXAMPLE_PATH = os.path.join(TEST_DIR, 'e101_example.py')
 
 if 'AUTOPEP8_COVERAGE' in os.environ and int(os.environ['AUTOPEP8_COVERAGE']):
     AUTOPEP8_CMD_TUPLE = (sys.executable, '-Wignore::DeprecationWarning',
                           '-m', 'coverage', 'run', '--branch', '--parallel',
                           '--omit=*/site-packages/*',
-                          os.path.join(ROOT_DIR, 'autopep8.py'),)
+                          AUTOPEP8_PATH,)
 else:
     # We need to specify the executable to make sure the correct Python
     # interpreter gets used.
     AUTOPEP8_CMD_TUPLE = (sys.executable, '-Wignore::DeprecationWarning',
-                          os.path.join(ROOT_DIR,
-                                       'autopep8.py'),)  # pragma: no cover
+                          AUTOPEP8_PATH,)  # pragma: no cover
 
 
 class UnitTests(unittest.TestCase):
@@ -78,27 +82,27 @@ class UnitTests(unittest.TestCase):
         self.assertEqual(
             'utf-8',
             autopep8.detect_encoding(
-                os.path.join(ROOT_DIR, 'test', 'test_autopep8.py')))
+                os.path.join(TEST_DIR, 'test_autopep8.py')))
 
     def test_detect_encoding_with_cookie(self):
         self.assertEqual(
             'iso-8859-1',
             autopep8.detect_encoding(
-                os.path.join(ROOT_DIR, 'test', 'iso_8859_1.py')))
+                os.path.join(TEST_DIR, 'iso_8859_1.py')))
 
     def test_readlines_from_file_with_bad_encoding(self):
         """Bad encoding should not cause an exception."""
         self.assertEqual(
             ['# -*- coding: zlatin-1 -*-\n'],
             autopep8.readlines_from_file(
-                os.path.join(ROOT_DIR, 'test', 'bad_encoding.py')))
+                os.path.join(TEST_DIR, 'bad_encoding.py')))
 
     def test_readlines_from_file_with_bad_encoding2(self):
         """Bad encoding should not cause an exception."""
         # This causes a warning on Python 3.
         with warnings.catch_warnings(record=True):
             self.assertTrue(autopep8.readlines_from_file(
-                os.path.join(ROOT_DIR, 'test', 'bad_encoding2.py')))
+                os.path.join(TEST_DIR, 'bad_encoding2.py')))
 
     def test_fix_whitespace(self):
         self.assertEqual(
@@ -266,14 +270,14 @@ def foo():
 
     def test_fix_file(self):
         ret = autopep8.fix_file(
-            filename=os.path.join(ROOT_DIR, 'test', 'example.py')
+            filename=EXAMPLE_PATH
         )
         self.assertNotEqual(None, ret)
         if ret is not None:
             self.assertIn('import ', ret)
 
     def test_fix_file_with_diff(self):
-        filename = os.path.join(ROOT_DIR, 'test', 'example.py')
+        filename = EXAMPLE_PATH
 
         ret = autopep8.fix_file(
             filename=filename,
@@ -287,7 +291,7 @@ def foo():
         self.assertEqual(
             'print(123)\n',
             autopep8.fix_lines(['print( 123 )\n'],
-                               options=autopep8.parse_args([''])))
+                               options=default_options()))
 
     def test_fix_code(self):
         self.assertEqual(
@@ -379,23 +383,20 @@ def foo():
                          autopep8.split_at_offsets('1234', [3, 2]))
 
     def test_is_python_file(self):
-        self.assertTrue(autopep8.is_python_file(
-            os.path.join(ROOT_DIR, 'autopep8.py')))
-
-        with temporary_file_context('#!/usr/bin/env python') as filename:
-            self.assertTrue(autopep8.is_python_file(filename))
-
-        with temporary_file_context('#!/usr/bin/python') as filename:
-            self.assertTrue(autopep8.is_python_file(filename))
-
-        with temporary_file_context('#!/usr/bin/python3') as filename:
-            self.assertTrue(autopep8.is_python_file(filename))
-
-        with temporary_file_context('#!/usr/bin/pythonic') as filename:
-            self.assertFalse(autopep8.is_python_file(filename))
-
-        with temporary_file_context('###!/usr/bin/python') as filename:
-            self.assertFalse(autopep8.is_python_file(filename))
+        self.assertTrue(autopep8.is_python_file(AUTOPEP8_PATH))
+
+        with TemporaryDirectory() as temp_directory:
+            for index, (first_line, expected) in enumerate([
+                    ('#!/usr/bin/env python', True),
+                    ('#!/usr/bin/python', True),
+                    ('#!/usr/bin/python3', True),
+                    ('#!/usr/bin/pythonic', False),
+                    ('###!/usr/bin/python', False)]):
+                filename = os.path.join(temp_directory, str(index))
+                with open(filename, 'w') as output:
+                    output.write(first_line)
+                self.assertEqual(expected, autopep8.is_python_file(filename),
+                                 msg=first_line)
 
         self.assertFalse(autopep8.is_python_file(os.devnull))
         self.assertFalse(autopep8.is_python_file('/bin/bash'))
@@ -433,15 +434,7 @@ def foo():
             with open(os.path.join(sub, 'c.py'), 'w'):
                 pass
 
-            # FIXME: Avoid changing directory. This may interfere with parallel
-            # test runs.
-            cwd = os.getcwd()
-            os.chdir(temp_directory)
-            try:
-                files = list(autopep8.find_files(
-                    ['dir'], True, [os.path.join('dir', 'ex')]))
-            finally:
-                os.chdir(cwd)
+            files = list(autopep8.find_files([target], True, [exclude]))
 
             file_names = [os.path.basename(f) for f in files]
             self.assertIn('a.py', file_names)
@@ -542,7 +535,7 @@ print('python')
 
     def test_fix_e225_avoid_failure(self):
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='    1\n')
 
         self.assertEqual(
@@ -552,7 +545,7 @@ print('python')
 
     def test_fix_e271_ignore_redundant(self):
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='x = 1\n')
 
         self.assertEqual(
@@ -562,7 +555,7 @@ print('python')
 
     def test_fix_e401_avoid_non_import(self):
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='    1\n')
 
         self.assertEqual(
@@ -572,7 +565,7 @@ print('python')
 
     def test_fix_e711_avoid_failure(self):
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='None == x\n')
 
         self.assertEqual(
@@ -586,7 +579,7 @@ print('python')
                                'column': 700}))
 
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='x <> None\n')
 
         self.assertEqual(
@@ -596,7 +589,7 @@ print('python')
 
     def test_fix_e712_avoid_failure(self):
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='True == x\n')
 
         self.assertEqual(
@@ -610,7 +603,7 @@ print('python')
                                'column': 700}))
 
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='x != True\n')
 
         self.assertEqual(
@@ -619,7 +612,7 @@ print('python')
                                'column': 3}))
 
         fix_pep8 = autopep8.FixPEP8(filename='',
-                                    options=autopep8.parse_args(['']),
+                                    options=default_options(),
                                     contents='x == False\n')
 
         self.assertEqual(
@@ -634,9 +627,7 @@ print('python')
 -foo
 +bar
 """,
-            '\n'.join(autopep8.get_diff_text(['foo\n'],
-                                             ['bar\n'],
-                                             '').split('\n')[3:]))
+            skip_lines(autopep8.get_diff_text(['foo\n'], ['bar\n'], ''), 3))
 
     def test_get_diff_text_without_newline(self):
         # We ignore the first two lines since it differs on Python 2.6.
@@ -646,9 +637,7 @@ print('python')
 \\ No newline at end of file
 +foo
 """,
-            '\n'.join(autopep8.get_diff_text(['foo'],
-                                             ['foo\n'],
-                                             '').split('\n')[3:]))
+            skip_lines(autopep8.get_diff_text(['foo'], ['foo\n'], ''), 3))
 
     def test_count_unbalanced_brackets(self):
         self.assertEqual(
@@ -994,12 +983,16 @@ try:
         # pep8 will complain about this even if the tab indentation found
         # elsewhere is in a multiline string. If we don't filter the innocuous
         # report properly, the below command will take a long time.
-        p = Popen(list(AUTOPEP8_CMD_TUPLE) +
-                  ['-vvv', '--select=E101', '--diff',
-                   '--global-config={}'.format(os.devnull),
-                   os.path.join(ROOT_DIR, 'test', 'e101_example.py')],
-                  stdout=PIPE, stderr=PIPE)
-        output = [x.decode('utf-8') for x in p.communicate()][0]
+        filename = E101_EXAMPLE_PATH
+        sio = StringIO()
+        with contextlib.redirect_stdout(sio), \
+                contextlib.redirect_stderr(StringIO()):
+            options = autopep8.parse_args(
+                ['-vvv', '--select=E101', '--diff',
+                 '--global-config={}'.format(os.devnull), filename],
+                apply_config=True)
+            diff = autopep8.fix_file(filename=filename, options=options)
+        output = sio.getvalue()
         setup_cfg_file = os.path.join(ROOT_DIR, "setup.cfg")
         tox_ini_file = os.path.join(ROOT_DIR, "tox.ini")
         expected = """\
@@ -1008,6 +1001,7 @@ read config path: {}
 read config path: {}
 """.format(setup_cfg_file, tox_ini_file)
         self.assertEqual(expected, output)
+        self.assertEqual('', diff)
 
     def test_e111_short(self):
         line = 'class Dummy:\n\n  def __init__(self):\n    pass\n'
@@ -1784,6 +1778,9 @@ while True:
 
 class SystemTestsE2(unittest.TestCase):
 
+    MANY_COMMAS_FIXED = str(list(range(200))) + '\n'
+    MANY_COMMAS_LINE = MANY_COMMAS_FIXED.replace(', ', ',')
+
     def test_e201(self):
         line = '(   1)\n'
         fixed = '(1)\n'
@@ -2027,10 +2024,9 @@ class Foo(object):
             self.assertEqual(fixed, result)
 
     def test_e231_with_many_commas(self):
-        fixed = str(list(range(200))) + '\n'
-        line = re.sub(', ', ',', fixed)
-        with autopep8_context(line, options=['--select=E231']) as result:
-            self.assertEqual(fixed, result)
+        with autopep8_context(self.MANY_COMMAS_LINE,
+                              options=['--select=E231']) as result:
+            self.assertEqual(self.MANY_COMMAS_FIXED, result)
 
     def test_e231_with_colon_after_comma(self):
         """ws_comma fixer ignores this case."""
@@ -3658,7 +3654,7 @@ one_two_three_four_five_six = {
         """Make sure _find_logical() does not crash."""
         line = 'if True:\r    from aaaaaaaaaaaaaaaa import bbbbbbbbbbbbbbbbbbb\r    \r    ccccccccccc = None\r'
         fixed = 'if True:\r    from aaaaaaaaaaaaaaaa import bbbbbbbbbbbbbbbbbbb\r\r    ccccccccccc = None\r'
-        with autopep8_context(line, options=['-aa']) as result:
+        with autopep8_file_context(line, options=['-aa']) as result:
             self.assertEqual(fixed, result)
 
     def test_e501_should_ignore_imports(self):
@@ -5484,31 +5480,31 @@ def f():
         line = "'abc'  \n"
         fixed = "-'abc'  \n+'abc'\n"
         with autopep8_subprocess(line, ['--diff']) as (result, retcode):
-            self.assertEqual(fixed, '\n'.join(result.split('\n')[3:]))
+            self.assertEqual(fixed, skip_lines(result, 3))
             self.assertEqual(retcode, autopep8.EXIT_CODE_OK)
 
     def test_diff_with_exit_code_option(self):
         line = "'abc'  \n"
         fixed = "-'abc'  \n+'abc'\n"
         with autopep8_subprocess(line, ['--diff', '--exit-code']) as (result, retcode):
-            self.assertEqual(fixed, '\n'.join(result.split('\n')[3:]))
+            self.assertEqual(fixed, skip_lines(result, 3))
             self.assertEqual(retcode, autopep8.EXIT_CODE_EXISTS_DIFF)
 
     def test_non_diff_with_exit_code_option(self):
         line = "'abc'\n"
         with autopep8_subprocess(line, ['--diff', '--exit-code']) as (result, retcode):
-            self.assertEqual('', '\n'.join(result.split('\n')[3:]))
+            self.assertEqual('', skip_lines(result, 3))
             self.assertEqual(retcode, autopep8.EXIT_CODE_OK)
 
     def test_non_diff_with_exit_code_and_jobs_options(self):
         line = "'abc'\n"
         with autopep8_subprocess(line, ['-j0', '--diff', '--exit-code']) as (result, retcode):
-            self.assertEqual('', '\n'.join(result.split('\n')[3:]))
+            self.assertEqual('', skip_lines(result, 3))
             self.assertEqual(retcode, autopep8.EXIT_CODE_OK)
 
     def test_diff_with_empty_file(self):
         with autopep8_subprocess('', ['--diff']) as (result, retcode):
-            self.assertEqual('\n'.join(result.split('\n')[3:]), '')
+            self.assertEqual(skip_lines(result, 3), '')
             self.assertEqual(retcode, autopep8.EXIT_CODE_OK)
 
     def test_diff_with_nonexistent_file(self):
@@ -5770,8 +5766,7 @@ for i in range(3):
         self.assertIn('--in-place and --diff are mutually exclusive', result)
 
     def test_recursive(self):
-        temp_directory = mkdtemp(dir='.')
-        try:
+        with TemporaryDirectory(dir='.') as temp_directory:
             with open(os.path.join(temp_directory, 'a.py'), 'w') as output:
                 output.write("'abc'  \n")
 
@@ -5783,21 +5778,14 @@ for i in range(3):
             p = Popen(list(AUTOPEP8_CMD_TUPLE) +
                       [temp_directory, '--recursive', '--diff'],
                       stdout=PIPE)
-            result = p.communicate()[0].decode('utf-8')
+            result = p.communicate()[0].decode('utf-8').split('\n')
 
-            self.assertEqual(
-                "-'abc'  \n+'abc'",
-                '\n'.join(result.split('\n')[3:5]))
+            self.assertEqual("-'abc'  \n+'abc'", '\n'.join(result[3:5]))
 
-            self.assertEqual(
-                '-123  \n+123',
-                '\n'.join(result.split('\n')[8:10]))
-        finally:
-            shutil.rmtree(temp_directory)
+            self.assertEqual('-123  \n+123', '\n'.join(result[8:10]))
 
     def test_recursive_should_not_crash_on_unicode_filename(self):
-        temp_directory = mkdtemp(dir='.')
-        try:
+        with TemporaryDirectory(dir='.') as temp_directory:
             for filename in ['x.py', 'é.py', 'é.txt']:
                 with open(os.path.join(temp_directory, filename), 'w'):
                     pass
@@ -5809,13 +5797,10 @@ for i in range(3):
                       stdout=PIPE)
             self.assertFalse(p.communicate()[0])
             self.assertEqual(0, p.returncode)
-        finally:
-            shutil.rmtree(temp_directory)
 
     def test_recursive_should_ignore_hidden(self):
-        temp_directory = mkdtemp(dir='.')
-        temp_subdirectory = mkdtemp(prefix='.', dir=temp_directory)
-        try:
+        with TemporaryDirectory(dir='.') as temp_directory:
+            temp_subdirectory = mkdtemp(prefix='.', dir=temp_directory)
             with open(os.path.join(temp_subdirectory, 'a.py'), 'w') as output:
                 output.write("'abc'  \n")
 
@@ -5826,12 +5811,9 @@ for i in range(3):
 
             self.assertEqual(0, p.returncode)
             self.assertEqual('', result)
-        finally:
-            shutil.rmtree(temp_directory)
 
     def test_exclude(self):
-        temp_directory = mkdtemp(dir='.')
-        try:
+        with TemporaryDirectory(dir='.') as temp_directory:
             with open(os.path.join(temp_directory, 'a.py'), 'w') as output:
                 output.write("'abc'  \n")
 
@@ -5848,12 +5830,9 @@ for i in range(3):
 
             self.assertNotIn('abc', result)
             self.assertIn('123', result)
-        finally:
-            shutil.rmtree(temp_directory)
 
     def test_exclude_with_directly_file_args(self):
-        temp_directory = mkdtemp(dir='.')
-        try:
+        with TemporaryDirectory(dir='.') as temp_directory:
             filepath_a = os.path.join(temp_directory, 'a.py')
             with open(filepath_a, 'w') as output:
                 output.write("'abc'  \n")
@@ -5870,8 +5849,6 @@ for i in range(3):
 
             self.assertNotIn('abc', result)
             self.assertIn('123', result)
-        finally:
-            shutil.rmtree(temp_directory)
 
     def test_invalid_option_combinations(self):
         line = "'abc'  \n"
@@ -5906,7 +5883,7 @@ for i in range(3):
 
     def test_inplace_with_multi_files(self):
         exception = None
-        with disable_stderr():
+        with contextlib.redirect_stderr(StringIO()):
             try:
                 autopep8.parse_args(['test.py', 'dummy.py'])
             except SystemExit as e:
@@ -6848,7 +6825,7 @@ one_two_three_four_five_six = {
         """Make sure _find_logical() does not crash."""
         line = 'if True:\r    from aaaaaaaaaaaaaaaa import bbbbbbbbbbbbbbbbbbb\r    \r    ccccccccccc = None\r'
         fixed = 'if True:\r    from aaaaaaaaaaaaaaaa import bbbbbbbbbbbbbbbbbbb\r\r    ccccccccccc = None\r'
-        with autopep8_context(line, options=['--experimental']) as result:
+        with autopep8_file_context(line, options=['--experimental']) as result:
             self.assertEqual(fixed, result)
 
     def test_e501_experimental_should_ignore_imports(self):
@@ -7427,17 +7404,49 @@ fstring = {"some_key": f"There is a string value inside of an f string, which it
 
 
 def fix_e266(source):
-    with autopep8_context(source, options=['--select=E266']) as result:
-        return result
+    return autopep8_fix(source, options=['--select=E266'])
 
 
 def fix_e265_and_e266(source):
-    with autopep8_context(source, options=['--select=E265,E266']) as result:
-        return result
+    return autopep8_fix(source, options=['--select=E265,E266'])
+
+
+def skip_lines(text, count):
+    """Return text without its first "count" lines."""
+    remaining = text.split('\n', count)
+    return remaining[count] if len(remaining) > count else ''
+
+
+@functools.lru_cache(maxsize=128)
+def parse_options(options):
+    """Return parsed options for a tuple of command-line arguments.
+
+    The result is shared between callers, so it must be copied before
+    being handed to autopep8, which may modify it.
+
+    """
+    return autopep8.parse_args([''] + list(options))
+
+
+def default_options():
+    return copy.deepcopy(parse_options(()))
+
+
+def autopep8_fix(line, options=None):
+    if not options:
+        options = []
+
+    options = copy.deepcopy(parse_options(tuple(options)))
+    return autopep8.fix_code(line, options=options)
 
 
 @contextlib.contextmanager
 def autopep8_context(line, options=None):
+    yield autopep8_fix(line, options=options)
+
+
+@contextlib.contextmanager
+def autopep8_file_context(line, options=None):
     if not options:
         options = []
 
@@ -7450,30 +7459,15 @@ def autopep8_context(line, options=None):
 def autopep8_subprocess(line, options, timeout=None):
     with temporary_file_context(line) as filename:
         p = Popen(list(AUTOPEP8_CMD_TUPLE) + [filename] + options, stdout=PIPE)
-        if timeout is None:
-            _stdout, _ = p.communicate()
-        else:
-            try:
-                _stdout, _ = p.communicate(timeout=timeout)
-            except TypeError:
-                # for Python2
-                while p.poll() is None and timeout > 0:
-                    time.sleep(0.5)
-                    timeout -= 0.5
-                if p.poll() is None:
-                    p.kill()
-                    raise Exception("subprocess is timed out")
-                _stdout, _ = p.communicate()
+        _stdout, _ = p.communicate(timeout=timeout)
         yield _stdout.decode('utf-8'), p.returncode
 
 
 @contextlib.contextmanager
 def temporary_file_context(text, suffix='', prefix=''):
     temporary = mkstemp(suffix=suffix, prefix=prefix)
-    os.close(temporary[0])
-    with autopep8.open_with_encoding(temporary[1],
-                                     encoding='utf-8',
-                                     mode='w') as temp_file:
+    with os.fdopen(temporary[0], mode='w', encoding='utf-8',
+                   newline='') as temp_file:
         temp_file.write(text)
     yield temporary[1]
     os.remove(temporary[1])
@@ -7482,10 +7476,8 @@ def temporary_file_context(text, suffix='', prefix=''):
 @contextlib.contextmanager
 def readonly_temporary_file_context(text, suffix='', prefix=''):
     temporary = mkstemp(suffix=suffix, prefix=prefix)
-    os.close(temporary[0])
-    with autopep8.open_with_encoding(temporary[1],
-                                     encoding='utf-8',
-                                     mode='w') as temp_file:
+    with os.fdopen(temporary[0], mode='w', encoding='utf-8',
+                   newline='') as temp_file:
         temp_file.write(text)
     os.chmod(temporary[1], stat.S_IRUSR)
     yield temporary[1]
@@ -7499,22 +7491,5 @@ def temporary_project_directory(prefix="autopep8test"):
     shutil.rmtree(temporary)
 
 
-@contextlib.contextmanager
-def disable_stderr():
-    sio = StringIO()
-    with capture_stderr(sio):
-        yield
-
-
-@contextlib.contextmanager
-def capture_stderr(sio):
-    _tmp = sys.stderr
-    sys.stderr = sio
-    try:
-        yield
-    finally:
-        sys.stderr = _tmp
-
-
 if __name__ == '__main__':
     unittest.main()